@@ -0,0 +1,8 @@
+import os
+
+# Hypercorn config for the Quart API server.
+# Run with: hypercorn -c python:hypercorn_conf server.app:app
+bind = [f"{os.getenv('NLWEB_HOST', '0.0.0.0')}:{os.getenv('NLWEB_PORT', '5000')}"]
+workers = (2 * (os.cpu_count() or 1)) + 1
+worker_class = "uvloop"
+keep_alive_timeout = 30
@@ -13,6 +13,13 @@ class OpenAIConfig:
     max_tokens: int = 2048
     timeout: int = 30
 
+    def __post_init__(self):
+        if self.temperature < 0 or self.temperature > 1:
+            raise ValueError("OpenAI temperature must be between 0 and 1")
+
+        if self.max_tokens < 1 or self.max_tokens > 4000:
+            raise ValueError("OpenAI max_tokens must be between 1 and 4000")
+
 @dataclass
 class NLWebConfig:
     server_host: str = "0.0.0.0"
@@ -57,14 +64,13 @@ class Config:
         )
         
     def validate(self):
-        """Validate configuration"""
+        """Validate configuration.
+
+        Value ranges are checked once at construction time by the dataclass
+        __post_init__ hooks; only the API key (which may legitimately be
+        empty until startup) is checked here.
+        """
         if not self.openai.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        if self.openai.temperature < 0 or self.openai.temperature > 1:
-            raise ValueError("OpenAI temperature must be between 0 and 1")
-            
-        if self.openai.max_tokens < 1 or self.openai.max_tokens > 4000:
-            raise ValueError("OpenAI max_tokens must be between 1 and 4000")
 
 config = Config()
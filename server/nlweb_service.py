@@ -1,49 +1,76 @@
+import asyncio
 import logging
 import time
 from typing import Dict, Any, List, Optional
-from server.openai_service import openai_service
-from server.vector_store import vector_store
-from server.schema_parser import schema_parser
+from functools import lru_cache
+from server.openai_service import get_openai_service
+from server.vector_store import get_vector_store
+from server.schema_parser import get_schema_parser
 from server.config import config
 
 logger = logging.getLogger(__name__)
 
 class NLWebService:
+    # How long a get_stats() result may be served from cache
+    STATS_CACHE_TTL = 1.0
+
     def __init__(self):
         self.data_sources: List[Dict[str, Any]] = []
         self.last_sync_time = None
-        
+        self._stats_cache: Optional[Dict[str, Any]] = None
+        self._stats_cached_at = 0.0
+
     async def process_ask_request(self, query: str, mode: str = "search", prev_context: Optional[str] = None) -> Dict[str, Any]:
         """Process NLWeb /ask endpoint request"""
         try:
-            start_time = time.time()
-            logger.info(f"Processing ask request: '{query}' (mode: {mode})")
+            start_ns = time.perf_counter_ns()
+            logger.info("Processing ask request: '%s' (mode: %s)", query, mode)
             
             # Search vector store for relevant documents
-            search_results = await vector_store.search(query, limit=20)
-            
-            # Extract documents and prepare for OpenAI
+            search_results = await get_vector_store().search(query, limit=20)
+
+            # Extract documents; this single list is reused as mainEntity
             relevant_docs = [result[0] for result in search_results]
-            
+
             if not relevant_docs:
                 return {
                     "@type": "SearchResultsPage",
                     "mainEntity": [],
                     "query": query,
                     "numberOfItems": 0,
-                    "processingTime": round(time.time() - start_time, 3),
+                    "processingTime": round((time.perf_counter_ns() - start_ns) / 1_000_000_000, 3),
                     "message": "No relevant results found in indexed data"
                 }
-            
+
+            # Plain search without conversation context doesn't need an AI
+            # summary — return the retrieval results directly and skip the
+            # OpenAI round-trip
+            if mode == "search" and not prev_context:
+                processing_time = (time.perf_counter_ns() - start_ns) / 1_000_000_000
+                logger.info("Ask request completed (search only): %d results, %.3fs",
+                            len(relevant_docs), processing_time)
+                return {
+                    "@context": "https://schema.org",
+                    "@type": "SearchResultsPage",
+                    "mainEntity": relevant_docs,
+                    "query": query,
+                    "numberOfItems": len(relevant_docs),
+                    "processingTime": round(processing_time, 3),
+                    "source": "NLWeb vector search",
+                    "aiResponse": None,
+                    "usage": {},
+                    "context": prev_context
+                }
+
             # Process with OpenAI
-            openai_result = await openai_service.process_query(
+            openai_result = await get_openai_service().process_query(
                 query=query,
                 context=prev_context,
                 schema_data=relevant_docs
             )
-            
-            processing_time = time.time() - start_time
-            
+
+            processing_time = (time.perf_counter_ns() - start_ns) / 1_000_000_000
+
             # Format response in Schema.org format
             response = {
                 "@context": "https://schema.org",
@@ -58,17 +85,17 @@ class NLWebService:
                 "context": prev_context
             }
             
-            logger.info(f"Ask request completed: {len(relevant_docs)} results, {processing_time:.3f}s")
+            logger.info("Ask request completed: %d results, %.3fs", len(relevant_docs), processing_time)
             return response
             
         except Exception as e:
-            logger.error(f"Ask request error: {str(e)}")
+            logger.error("Ask request error: %s", e)
             raise Exception(f"NLWeb ask processing failed: {str(e)}")
     
     async def process_mcp_request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Process Model Context Protocol request"""
         try:
-            logger.info(f"Processing MCP request: {method}")
+            logger.info("Processing MCP request: %s", method)
             
             if method == "ask":
                 # Handle MCP ask method
@@ -132,18 +159,14 @@ class NLWebService:
                     query_parts.append(f"in {location}")
                     
                 search_query = " ".join(query_parts)
-                search_results = await vector_store.search(search_query, limit=limit)
-                
-                # Filter by type if specified
-                filtered_results = []
-                for doc, score in search_results:
-                    if not content_type or doc.get('@type', '').lower() == content_type.lower():
-                        filtered_results.append(doc)
-                
+                search_results = await get_vector_store().search(
+                    search_query, limit=limit, type_filter=content_type or None
+                )
+
                 return {
-                    "jsonrpc": "2.0", 
+                    "jsonrpc": "2.0",
                     "result": {
-                        "content": filtered_results,
+                        "content": [doc for doc, score in search_results],
                         "isError": False
                     }
                 }
@@ -158,7 +181,7 @@ class NLWebService:
                 }
                 
         except Exception as e:
-            logger.error(f"MCP request error: {str(e)}")
+            logger.error("MCP request error: %s", e)
             return {
                 "jsonrpc": "2.0",
                 "error": {
@@ -170,10 +193,12 @@ class NLWebService:
     async def add_data_source(self, source: Dict[str, Any]) -> bool:
         """Add and index a new data source"""
         try:
-            logger.info(f"Adding data source: {source['url']} ({source['type']})")
+            logger.info("Adding data source: %s (%s)", source['url'], source['type'])
             
             documents = []
             
+            schema_parser = get_schema_parser()
+
             if source["type"] == "schema_org":
                 if source["url"].endswith(".xml"):
                     # Sitemap
@@ -181,12 +206,12 @@ class NLWebService:
                 else:
                     # Single URL
                     documents = await schema_parser.parse_url(source["url"])
-                    
+
             elif source["type"] == "rss":
                 documents = await schema_parser.parse_rss_feed(source["url"])
-            
+
             if documents:
-                await vector_store.index_documents(documents)
+                await get_vector_store().index_documents(documents)
                 
                 # Update source info
                 source["object_count"] = len(documents)
@@ -195,23 +220,28 @@ class NLWebService:
                 
                 self.data_sources.append(source)
                 self.last_sync_time = time.time()
-                
-                logger.info(f"Successfully added data source with {len(documents)} objects")
+                self._stats_cache = None  # Stats changed, drop cached copy
+
+                logger.info("Successfully added data source with %d objects", len(documents))
                 return True
             
             return False
             
         except Exception as e:
-            logger.error(f"Error adding data source: {str(e)}")
+            logger.error("Error adding data source: %s", e)
             source["status"] = "error"
             source["error"] = str(e)
             return False
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get NLWeb service statistics"""
-        vector_stats = vector_store.get_stats()
-        
-        return {
+        """Get NLWeb service statistics (cached for STATS_CACHE_TTL seconds)"""
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cached_at < self.STATS_CACHE_TTL:
+            return self._stats_cache
+
+        vector_stats = get_vector_store().get_stats()
+
+        stats = {
             "total_sites": len(self.data_sources),
             "schema_objects": vector_stats["total_documents"],
             "last_sync": self.last_sync_time,
@@ -219,7 +249,11 @@ class NLWebService:
             "data_sources": self.data_sources,
             "vector_store": vector_stats
         }
-    
+
+        self._stats_cache = stats
+        self._stats_cached_at = now
+        return stats
+
     async def initialize_demo_data(self):
         """Initialize with sample Schema.org data sources"""
         demo_sources = [
@@ -232,10 +266,15 @@ class NLWebService:
         ]
         
         logger.info("Initializing demo data sources...")
-        for source in demo_sources:
-            try:
-                await self.add_data_source(source.copy())
-            except Exception as e:
-                logger.warning(f"Failed to add demo source {source['name']}: {str(e)}")
+        results = await asyncio.gather(
+            *(self.add_data_source(source.copy()) for source in demo_sources),
+            return_exceptions=True
+        )
+        for source, result in zip(demo_sources, results):
+            if isinstance(result, Exception):
+                logger.warning("Failed to add demo source %s: %s", source['name'], result)
 
-nlweb_service = NLWebService()
+@lru_cache(maxsize=1)
+def get_nlweb_service() -> NLWebService:
+    """Shared NLWebService, created on first use"""
+    return NLWebService()
@@ -1,38 +1,79 @@
-import asyncio
+import hashlib
 import logging
 import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
-import openai
-from openai import OpenAI
+import orjson
+from openai import AsyncOpenAI
 from server.config import config
 
 logger = logging.getLogger(__name__)
 
+# Constant prefix of every system message; built once at import time
+_BASE_SYSTEM_MESSAGE = """You are an AI assistant that helps users find information from structured web data.
+        You have access to Schema.org structured data from various websites.
+
+        Your responses should:
+        1. Be helpful and accurate based on the provided data
+        2. Include relevant Schema.org structured data in your response
+        3. Format responses in a clear, conversational manner
+        4. When possible, return results in Schema.org JSON-LD format
+        5. If no relevant data is found, explain this clearly
+        """
+
 class OpenAIService:
+    # Maximum number of embeddings kept in the in-process LRU cache
+    EMBEDDING_CACHE_SIZE = 4096
+
     def __init__(self):
-        self.client = OpenAI(api_key=config.openai.api_key)
+        # Single client for the process lifetime; retries are delegated to
+        # the SDK's built-in exponential backoff via with_options below.
+        self.client = AsyncOpenAI(
+            api_key=config.openai.api_key,
+            timeout=config.openai.timeout,
+            max_retries=0
+        )
         self.config = config.openai
-        
+        # LRU of text hash -> embedding; repeat queries skip the API call
+        self._embed_cache: OrderedDict[str, List[float]] = OrderedDict()
+
     async def process_query(self, query: str, context: Optional[str] = None, schema_data: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """Process natural language query using OpenAI"""
         try:
-            start_time = time.time()
-            
+            start_ns = time.perf_counter_ns()
+
             # Build system message with context
-            system_message = self._build_system_message(context, schema_data)
-            
             messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": query}
+                {"role": "system", "content": self._build_system_message(context)}
             ]
+            if schema_data:
+                # Ship a compact JSON sample in its own system message
+                # instead of inlining per-item prose into the prompt
+                messages.append({
+                    "role": "system",
+                    "content": orjson.dumps(
+                        [{"t": d.get('@type'), "n": d.get('name')} for d in schema_data[:3]]
+                    ).decode()
+                })
+            messages.append({"role": "user", "content": query})
             
-            logger.info(f"OpenAI request: model={self.config.model}, temperature={self.config.temperature}")
-            
-            # Make API request with retry logic
-            response = await self._make_request_with_retry(messages)
+            logger.info("OpenAI request: model=%s, temperature=%s", self.config.model, self.config.temperature)
             
-            processing_time = time.time() - start_time
+            # Make API request; the SDK retries rate limits and transient
+            # API errors with jittered exponential backoff
+            response = await self.client.with_options(
+                max_retries=config.error_handling.retry_attempts
+            ).chat.completions.create(
+                model=self.config.model,
+                messages=messages,  # type: ignore
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                timeout=self.config.timeout
+            )
             
+            processing_time = (time.perf_counter_ns() - start_ns) / 1_000_000_000
+
             # Extract and structure the response
             result = {
                 "response": response.choices[0].message.content,
@@ -45,82 +86,74 @@ class OpenAIService:
                 }
             }
             
-            logger.info(f"OpenAI response: {result['usage']['total_tokens']} tokens, {processing_time:.3f}s")
+            logger.info("OpenAI response: %d tokens, %.3fs", result['usage']['total_tokens'], processing_time)
             return result
             
         except Exception as e:
-            logger.error(f"OpenAI API error: {str(e)}")
+            logger.error("OpenAI API error: %s", e)
             raise Exception(f"OpenAI processing failed: {str(e)}")
     
-    def _build_system_message(self, context: Optional[str], schema_data: Optional[List[Dict]]) -> str:
-        """Build system message with context and schema data"""
-        base_message = """You are an AI assistant that helps users find information from structured web data. 
-        You have access to Schema.org structured data from various websites.
-        
-        Your responses should:
-        1. Be helpful and accurate based on the provided data
-        2. Include relevant Schema.org structured data in your response
-        3. Format responses in a clear, conversational manner
-        4. When possible, return results in Schema.org JSON-LD format
-        5. If no relevant data is found, explain this clearly
+    def _build_system_message(self, context: Optional[str]) -> str:
+        """Build system message with optional conversation context.
+
+        Structured data samples are sent as a separate JSON system
+        message (see process_query) rather than inlined here.
         """
-        
         if context:
-            base_message += f"\n\nContext from previous queries: {context}"
-            
-        if schema_data:
-            base_message += f"\n\nAvailable structured data: {len(schema_data)} relevant items found"
-            # Add sample of schema data
-            for item in schema_data[:3]:  # Limit to first 3 items
-                base_message += f"\n- {item.get('@type', 'Unknown')}: {item.get('name', 'No name')}"
-        
-        return base_message
-    
-    async def _make_request_with_retry(self, messages: List[Dict[str, str]]) -> Any:
-        """Make OpenAI request with exponential backoff retry"""
-        for attempt in range(config.error_handling.retry_attempts):
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=messages,  # type: ignore
-                    temperature=self.config.temperature,
-                    max_tokens=self.config.max_tokens,
-                    timeout=self.config.timeout
-                )
-                return response
-                
-            except openai.RateLimitError as e:
-                if attempt < config.error_handling.retry_attempts - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Rate limit hit, retrying in {wait_time}s (attempt {attempt + 1})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                raise e
-                
-            except openai.APIError as e:
-                if attempt < config.error_handling.retry_attempts - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"API error, retrying in {wait_time}s: {str(e)}")
-                    await asyncio.sleep(wait_time)
-                    continue
-                raise e
-                
-        raise Exception(f"Failed after {config.error_handling.retry_attempts} attempts")
+            return f"{_BASE_SYSTEM_MESSAGE}\n\nContext from previous queries: {context}"
+        return _BASE_SYSTEM_MESSAGE
     
+    @staticmethod
+    def _embed_cache_key(text: str) -> str:
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _embed_cache_put(self, key: str, embedding: List[float]):
+        self._embed_cache[key] = embedding
+        self._embed_cache.move_to_end(key)
+        while len(self._embed_cache) > self.EMBEDDING_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)
+
     async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for text using OpenAI"""
+        """Create embeddings for text using OpenAI.
+
+        Results are cached in a bounded LRU keyed by text hash, so only
+        texts not seen before are sent to the API.
+        """
         try:
-            response = self.client.embeddings.create(
-                model=config.nlweb.embedding_model,
-                input=texts
-            )
-            
-            embeddings = [data.embedding for data in response.data]
-            logger.info(f"Created embeddings for {len(texts)} texts")
-            return embeddings
-            
+            keys = [self._embed_cache_key(text) for text in texts]
+
+            # Partition into cache hits and texts that still need the API
+            embeddings: List[Optional[List[float]]] = []
+            missing_indices = []
+            for i, key in enumerate(keys):
+                cached = self._embed_cache.get(key)
+                if cached is not None:
+                    self._embed_cache.move_to_end(key)
+                    embeddings.append(cached)
+                else:
+                    embeddings.append(None)
+                    missing_indices.append(i)
+
+            if missing_indices:
+                response = await self.client.with_options(
+                    max_retries=config.error_handling.retry_attempts
+                ).embeddings.create(
+                    model=config.nlweb.embedding_model,
+                    input=[texts[i] for i in missing_indices]
+                )
+                for i, data in zip(missing_indices, response.data):
+                    embeddings[i] = data.embedding
+                    self._embed_cache_put(keys[i], data.embedding)
+
+            logger.info("Created embeddings for %d texts (%d uncached)", len(texts), len(missing_indices))
+            return embeddings  # type: ignore[return-value]
+
         except Exception as e:
-            logger.error(f"Embedding creation error: {str(e)}")
+            logger.error("Embedding creation error: %s", e)
             raise Exception(f"Embedding creation failed: {str(e)}")
 
-openai_service = OpenAIService()
+@lru_cache(maxsize=1)
+def get_openai_service() -> OpenAIService:
+    """Shared OpenAIService, created on first use so the AsyncOpenAI client
+    binds to the event loop policy installed at startup"""
+    return OpenAIService()
@@ -1,54 +1,377 @@
-import json
+import asyncio
+import hashlib
 import logging
-import requests
+import os
+import pickle
+import time
+from collections import deque
+from io import BytesIO, StringIO
+import ijson
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import aiohttp
 from bs4 import BeautifulSoup
-from typing import Dict, List, Any, Optional
+from lxml import etree, html as lxml_html
+from typing import Dict, List, Any, Optional, Tuple
 from urllib.parse import urljoin, urlparse
-import xml.etree.ElementTree as ET
 
 logger = logging.getLogger(__name__)
 
+_SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+_SITEMAP_LOC = f'{{{_SITEMAP_NS}}}loc'
+_SITEMAP_CHILD = f'{{{_SITEMAP_NS}}}sitemap'
+
+def _parse_sitemap_locs(content: bytes) -> Tuple[List[str], List[str]]:
+    """Stream <loc> entries out of sitemap XML.
+
+    iterparse visits only the loc tags and clears each element after
+    reading it, so large sitemap indexes never materialize a full DOM.
+    Returns (page_urls, child_sitemap_urls), split on the parent tag.
+    """
+    page_urls: List[str] = []
+    child_sitemaps: List[str] = []
+    for _, elem in etree.iterparse(BytesIO(content), tag=_SITEMAP_LOC):
+        if elem.text:
+            parent = elem.getparent()
+            if parent is not None and parent.tag == _SITEMAP_CHILD:
+                child_sitemaps.append(elem.text)
+            else:
+                page_urls.append(elem.text)
+        elem.clear()
+    return page_urls, child_sitemaps
+
+def _extract_schema_objects(data: Any, supported_types) -> List[Dict[str, Any]]:
+    """Extract supported Schema.org objects from JSON-LD data.
+
+    Walks the structure iteratively with an explicit worklist instead of
+    recursing (no Python frame per nested value), and drops objects of
+    unsupported types at the source.
+    """
+    objects = []
+    stack = deque([data])
+    while stack:
+        node = stack.popleft()
+        if isinstance(node, dict):
+            node_type = node.get('@type')
+            if node_type:
+                if node_type in supported_types:
+                    objects.append(node)
+            else:
+                stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return objects
+
+# JSON-LD blobs larger than this stream through ijson; below it the
+# setup cost of event parsing outweighs holding the parsed structure
+_LARGE_JSON_LD = 256_000
+
+def _extract_schema_objects_stream(text: str, supported_types) -> List[Dict[str, Any]]:
+    """Extract supported Schema.org objects from a large JSON-LD string.
+
+    Streams parse events with ijson while mirroring the semantics of
+    _extract_schema_objects: only the outermost typed object is emitted,
+    with its nested payload intact. Typed dicts are kept as candidates
+    until their ancestry is known; a typed ancestor absorbs (and a typed
+    unsupported ancestor discards) anything completed inside it. Values
+    that finish while only arrays are open can no longer gain a typed
+    ancestor, so they are finalized and released immediately — a
+    top-level catalog array never sits fully in memory.
+    """
+    objects: List[Dict[str, Any]] = []
+    containers: List[Any] = []       # open dicts and lists, outermost first
+    keys: List[Optional[str]] = []   # pending key per open dict
+    candidates: List[Dict[str, Any]] = []  # emitted-unless-absorbed dicts
+    marks: List[int] = []            # len(candidates) at each dict's start
+    open_dicts = 0
+
+    def attach(value):
+        parent = containers[-1]
+        if isinstance(parent, list):
+            parent.append(value)
+        else:
+            parent[keys[-1]] = value
+
+    # use_float keeps numbers as native floats (not Decimal), matching
+    # orjson output and staying serializable on the way back out
+    for event, value in ijson.basic_parse(StringIO(text), use_float=True):
+        if event == 'start_map':
+            containers.append({})
+            keys.append(None)
+            marks.append(len(candidates))
+            open_dicts += 1
+        elif event == 'map_key':
+            keys[-1] = value
+        elif event == 'end_map':
+            obj = containers.pop()
+            keys.pop()
+            mark = marks.pop()
+            open_dicts -= 1
+            if obj.get('@type'):
+                # A typed dict blocks emission of anything inside it,
+                # matching the worklist walker which never descends
+                # past a typed node
+                del candidates[mark:]
+                if obj['@type'] in supported_types:
+                    candidates.append(obj)
+            if open_dicts:
+                attach(obj)
+            elif containers:
+                # Only arrays remain open, so no typed ancestor can
+                # appear anymore: finalize and drop the subtree
+                objects.extend(candidates)
+                candidates.clear()
+        elif event == 'start_array':
+            containers.append([])
+        elif event == 'end_array':
+            arr = containers.pop()
+            if open_dicts and containers:
+                attach(arr)
+        elif open_dicts and containers:
+            attach(value)
+
+    objects.extend(candidates)
+    return objects
+
+# Tags whose microdata/RDFa value lives in an attribute; for these the
+# subtree text is never the value, so text_content() can be skipped
+_PROP_CONTENT_TAGS = frozenset({'meta', 'link', 'time', 'data', 'img'})
+
+def _prop_value(prop) -> str:
+    """Extract a microdata/RDFa property value from an lxml element"""
+    if prop.tag in _PROP_CONTENT_TAGS:
+        return (prop.get('content') or prop.get('href')
+                or prop.get('src') or prop.get('datetime') or '')
+    return prop.get('content') or prop.text_content().strip()
+
+def _parse_microdata(tree, supported_types) -> List[Dict[str, Any]]:
+    """Basic microdata parsing over an lxml tree"""
+    objects = []
+
+    # One XPath pass; libxml2 walks the tree in C instead of BS4
+    # re-traversing it per attribute lookup
+    for item in tree.xpath('//*[@itemtype]'):
+        itemtype = item.get('itemtype', '')
+        if 'schema.org' in itemtype:
+            # rpartition takes just the last path segment without
+            # splitting the whole URL
+            schema_type = itemtype.rpartition('/')[2]
+            if schema_type in supported_types:
+                obj = {'@type': schema_type}
+
+                # Extract properties
+                for prop in item.xpath('.//*[@itemprop]'):
+                    obj[prop.get('itemprop')] = _prop_value(prop)
+
+                objects.append(obj)
+
+    return objects
+
+def _parse_rdfa(tree, supported_types) -> List[Dict[str, Any]]:
+    """Basic RDFa parsing over an lxml tree"""
+    objects = []
+
+    for item in tree.xpath('//*[@typeof]'):
+        typeof = item.get('typeof', '')
+        # typeof is space-separated per the RDFa spec; a set intersection
+        # on the tokens beats a substring scan per supported type
+        hit = supported_types.intersection(typeof.split())
+        if hit:
+            schema_type = next(iter(hit))
+            obj = {'@type': schema_type}
+
+            # Extract properties
+            for prop in item.xpath('.//*[@property]'):
+                obj[prop.get('property')] = _prop_value(prop)
+
+            objects.append(obj)
+
+    return objects
+
+def _parse_html_sync(content: bytes, supported_types, url: str) -> List[Dict[str, Any]]:
+    """CPU-bound HTML parse step; module-level so it can run in a
+    ProcessPoolExecutor worker"""
+    # Parse once with lxml directly; the BS4 wrapper layer added a
+    # Python object per node without being used for anything here
+    tree = lxml_html.fromstring(content)
+    schema_objects = []
+
+    # Parse JSON-LD
+    for script in tree.xpath('//script[@type="application/ld+json"]'):
+        text = script.text
+        if not text:
+            continue
+        try:
+            if len(text) > _LARGE_JSON_LD:
+                # Multi-MB catalogs stream through ijson rather than
+                # being materialized in one shot
+                schema_objects.extend(
+                    _extract_schema_objects_stream(text, supported_types)
+                )
+            else:
+                # orjson's SIMD-accelerated parser; 2-5x faster than
+                # stdlib json
+                data = orjson.loads(text)
+                schema_objects.extend(_extract_schema_objects(data, supported_types))
+        except (orjson.JSONDecodeError, ijson.JSONError) as e:
+            logger.warning(f"Invalid JSON-LD in {url}: {str(e)}")
+
+    # Parse microdata (basic implementation)
+    schema_objects.extend(_parse_microdata(tree, supported_types))
+
+    # Parse RDFa (basic implementation)
+    schema_objects.extend(_parse_rdfa(tree, supported_types))
+
+    # Every extractor above already checks @type against supported_types
+    # at the source, so no second filtering pass is needed
+    return schema_objects
+
 class SchemaOrgParser:
-    def __init__(self):
-        self.supported_types = {
-            'Restaurant', 'Hotel', 'Event', 'Organization', 
+    # Default cap on in-flight fetches and sitemap page parses
+    MAX_CONCURRENT_FETCHES = 20
+
+    # How long parsed results for a URL stay fresh without revalidation
+    CACHE_TTL = 3600.0
+    # Directory for the pickled per-URL cache entries
+    CACHE_DIR = os.getenv('SCHEMA_CACHE_DIR', '.schema_cache')
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENT_FETCHES
+        self.supported_types = frozenset({
+            'Restaurant', 'Hotel', 'Event', 'Organization',
             'Product', 'Service', 'Place', 'Person', 'Article'
-        }
-        
+        })
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._fetch_sem: Optional[asyncio.Semaphore] = None
+        # Parsing is CPU-bound; a process pool lets page N parse while
+        # page N+1 is still being fetched, without holding the GIL
+        self._pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        # url -> {etag, last_modified, content_hash, expires_at, objects};
+        # backed by pickle files in CACHE_DIR so restarts stay warm
+        self._url_cache: Dict[str, Dict[str, Any]] = {}
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + '.pkl')
+
+    def _cache_get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Look up a cache entry, falling back to the on-disk copy"""
+        entry = self._url_cache.get(url)
+        if entry is None:
+            try:
+                with open(self._cache_path(url), 'rb') as f:
+                    entry = pickle.load(f)
+                self._url_cache[url] = entry
+            except (OSError, pickle.PickleError):
+                return None
+        return entry
+
+    def _cache_put(self, url: str, entry: Dict[str, Any]):
+        """Store a cache entry in memory and on disk"""
+        self._url_cache[url] = entry
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            with open(self._cache_path(url), 'wb') as f:
+                pickle.dump(entry, f)
+        except (OSError, pickle.PickleError) as e:
+            logger.warning(f"Could not persist cache entry for {url}: {str(e)}")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the pooled HTTP session on the running loop"""
+        if self._session is None or self._session.closed:
+            # Keep-alive pooling sized for sitemap crawls that hammer a
+            # single host: sockets get reused instead of paying TCP+TLS
+            # setup per fetch, and DNS answers are cached between them
+            connector = aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=32,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={'Accept-Encoding': 'gzip, deflate'}
+            )
+            self._fetch_sem = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _fetch(self, url: str) -> bytes:
+        """Fetch a URL with bounded concurrency and return the body bytes"""
+        session = self._get_session()
+        async with self._fetch_sem:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                return await response.read()
+
+    async def _fetch_conditional(self, url: str, headers: Dict[str, str]):
+        """Conditional GET; returns (status, response headers, body bytes).
+
+        The body is empty when the server answers 304 Not Modified.
+        """
+        session = self._get_session()
+        async with self._fetch_sem:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return 304, response.headers, b''
+                response.raise_for_status()
+                return response.status, response.headers, await response.read()
+
+    async def close(self):
+        """Close the pooled HTTP session and the parse worker pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._pool.shutdown(wait=False)
+
     async def parse_url(self, url: str) -> List[Dict[str, Any]]:
-        """Parse Schema.org data from a single URL"""
+        """Parse Schema.org data from a single URL.
+
+        Results are cached per URL with a TTL; stale entries are
+        revalidated with a conditional GET, and unchanged bodies
+        (same content hash) skip the parse step entirely.
+        """
         try:
+            entry = self._cache_get(url)
+            now = time.time()
+            if entry and now < entry['expires_at']:
+                logger.info(f"Cache hit for {url}")
+                return entry['objects']
+
             logger.info(f"Parsing Schema.org data from: {url}")
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            schema_objects = []
-            
-            # Parse JSON-LD
-            json_ld_scripts = soup.find_all('script', {'type': 'application/ld+json'})
-            for script in json_ld_scripts:
-                try:
-                    data = json.loads(script.string)
-                    schema_objects.extend(self._extract_schema_objects(data))
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Invalid JSON-LD in {url}: {str(e)}")
-            
-            # Parse microdata (basic implementation)
-            microdata_objects = self._parse_microdata(soup)
-            schema_objects.extend(microdata_objects)
-            
-            # Parse RDFa (basic implementation)
-            rdfa_objects = self._parse_rdfa(soup)
-            schema_objects.extend(rdfa_objects)
-            
-            # Filter and clean objects
-            filtered_objects = [
-                obj for obj in schema_objects 
-                if obj.get('@type') in self.supported_types
-            ]
-            
+
+            headers = {}
+            if entry:
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+
+            status, resp_headers, content = await self._fetch_conditional(url, headers)
+
+            if status == 304 and entry:
+                # Page unchanged; just refresh the expiry
+                entry['expires_at'] = now + self.CACHE_TTL
+                self._cache_put(url, entry)
+                return entry['objects']
+
+            content_hash = hashlib.sha1(content).hexdigest()
+            if entry and entry.get('content_hash') == content_hash:
+                # Same body as last time; reuse the parsed objects
+                filtered_objects = entry['objects']
+            else:
+                loop = asyncio.get_running_loop()
+                filtered_objects = await loop.run_in_executor(
+                    self._pool, _parse_html_sync, content, self.supported_types, url
+                )
+
+            self._cache_put(url, {
+                'etag': resp_headers.get('ETag'),
+                'last_modified': resp_headers.get('Last-Modified'),
+                'content_hash': content_hash,
+                'expires_at': now + self.CACHE_TTL,
+                'objects': filtered_objects
+            })
+
             logger.info(f"Found {len(filtered_objects)} Schema.org objects in {url}")
             return filtered_objects
             
@@ -56,38 +379,54 @@ class SchemaOrgParser:
             logger.error(f"Error parsing {url}: {str(e)}")
             return []
     
-    async def parse_sitemap(self, sitemap_url: str) -> List[Dict[str, Any]]:
-        """Parse Schema.org data from all URLs in a sitemap"""
+    async def parse_sitemap(self, sitemap_url: str,
+                            max_urls: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Parse Schema.org data from all URLs in a sitemap.
+
+        Concurrency is bounded by max_concurrency rather than truncating
+        the crawl; pass max_urls to cap how many pages are visited.
+        """
         try:
             logger.info(f"Processing sitemap: {sitemap_url}")
-            
-            response = requests.get(sitemap_url, timeout=30)
-            response.raise_for_status()
-            
-            # Parse sitemap XML
-            root = ET.fromstring(response.content)
-            
-            # Handle different sitemap formats
-            urls = []
-            namespaces = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            # Standard sitemap
-            for url_elem in root.findall('.//sitemap:url/sitemap:loc', namespaces):
-                urls.append(url_elem.text)
-            
-            # Sitemap index
-            for sitemap_elem in root.findall('.//sitemap:sitemap/sitemap:loc', namespaces):
-                if sitemap_elem.text:
-                    urls.extend(await self._get_sitemap_urls(sitemap_elem.text))
-            
+
+            content = await self._fetch(sitemap_url)
+
+            # Stream the sitemap XML; handles both page sitemaps and
+            # sitemap indexes in one pass
+            urls, child_sitemaps = _parse_sitemap_locs(content)
+
+            # Sitemap index: fetch child sitemaps concurrently
+            if child_sitemaps:
+                child_results = await asyncio.gather(
+                    *(self._get_sitemap_urls(u) for u in child_sitemaps)
+                )
+                for child_urls in child_results:
+                    urls.extend(child_urls)
+
             logger.info(f"Found {len(urls)} URLs in sitemap")
-            
-            # Parse schema from each URL (limit for demo)
+
+            if max_urls is not None:
+                urls = urls[:max_urls]
+
+            # Parse every URL concurrently; the semaphore caps in-flight
+            # page parses so big sitemaps don't stampede the host
+            sem = asyncio.Semaphore(self.max_concurrency)
+
+            async def bounded_parse(url: str) -> List[Dict[str, Any]]:
+                async with sem:
+                    return await self.parse_url(url)
+
             all_objects = []
-            for url in urls[:50]:  # Limit to first 50 URLs for demo
-                objects = await self.parse_url(url)
-                all_objects.extend(objects)
-            
+            results = await asyncio.gather(
+                *(bounded_parse(url) for url in urls),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Sitemap page parse failed: {str(result)}")
+                else:
+                    all_objects.extend(result)
+
             return all_objects
             
         except Exception as e:
@@ -98,11 +437,10 @@ class SchemaOrgParser:
         """Parse Schema.org data from RSS feed items"""
         try:
             logger.info(f"Processing RSS feed: {feed_url}")
-            
-            response = requests.get(feed_url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'xml')
+
+            content = await self._fetch(feed_url)
+
+            soup = BeautifulSoup(content, 'lxml-xml')
             items = soup.find_all('item')
             
             schema_objects = []
@@ -128,85 +466,19 @@ class SchemaOrgParser:
             logger.error(f"Error processing RSS feed {feed_url}: {str(e)}")
             return []
     
-    def _extract_schema_objects(self, data: Any) -> List[Dict[str, Any]]:
-        """Extract Schema.org objects from JSON-LD data"""
-        objects = []
-        
-        if isinstance(data, dict):
-            if data.get('@type'):
-                objects.append(data)
-            else:
-                # Recursively search for objects
-                for value in data.values():
-                    objects.extend(self._extract_schema_objects(value))
-        elif isinstance(data, list):
-            for item in data:
-                objects.extend(self._extract_schema_objects(item))
-        
-        return objects
-    
-    def _parse_microdata(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
-        """Basic microdata parsing"""
-        objects = []
-        microdata_items = soup.find_all(attrs={'itemtype': True})
-        
-        for item in microdata_items:
-            itemtype = item.get('itemtype', '')
-            if 'schema.org' in itemtype:
-                schema_type = itemtype.split('/')[-1]
-                if schema_type in self.supported_types:
-                    obj = {'@type': schema_type}
-                    
-                    # Extract properties
-                    props = item.find_all(attrs={'itemprop': True})
-                    for prop in props:
-                        prop_name = prop.get('itemprop')
-                        prop_value = prop.get('content') or prop.text.strip()
-                        obj[prop_name] = prop_value
-                    
-                    objects.append(obj)
-        
-        return objects
-    
-    def _parse_rdfa(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
-        """Basic RDFa parsing"""
-        objects = []
-        rdfa_items = soup.find_all(attrs={'typeof': True})
-        
-        for item in rdfa_items:
-            typeof = item.get('typeof', '')
-            if any(schema_type in typeof for schema_type in self.supported_types):
-                schema_type = next((t for t in self.supported_types if t in typeof), 'Thing')
-                obj = {'@type': schema_type}
-                
-                # Extract properties
-                props = item.find_all(attrs={'property': True})
-                for prop in props:
-                    prop_name = prop.get('property')
-                    prop_value = prop.get('content') or prop.text.strip()
-                    obj[prop_name] = prop_value
-                
-                objects.append(obj)
-        
-        return objects
-    
     async def _get_sitemap_urls(self, sitemap_url: str) -> List[str]:
         """Get URLs from a sitemap"""
         try:
-            response = requests.get(sitemap_url, timeout=30)
-            response.raise_for_status()
-            
-            root = ET.fromstring(response.content)
-            namespaces = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            urls = []
-            for url_elem in root.findall('.//sitemap:url/sitemap:loc', namespaces):
-                urls.append(url_elem.text)
-            
+            content = await self._fetch(sitemap_url)
+
+            urls, _ = _parse_sitemap_locs(content)
             return urls
             
         except Exception as e:
             logger.warning(f"Error parsing sitemap {sitemap_url}: {str(e)}")
             return []
 
-schema_parser = SchemaOrgParser()
+@lru_cache(maxsize=1)
+def get_schema_parser() -> SchemaOrgParser:
+    """Shared SchemaOrgParser, created on first use"""
+    return SchemaOrgParser()
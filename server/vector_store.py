@@ -1,16 +1,146 @@
+import asyncio
+import hashlib
 import logging
 import numpy as np
+from collections import Counter, OrderedDict
 from typing import List, Dict, Any, Tuple, Optional
-from sklearn.metrics.pairwise import cosine_similarity
-from server.openai_service import openai_service
+from functools import lru_cache
+from server.config import config
+from server.openai_service import get_openai_service
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional native dependency
+    hnswlib = None
 
 logger = logging.getLogger(__name__)
 
+class EmbeddingBatcher:
+    """Coalesces embedding requests from concurrent callers.
+
+    Texts are queued with a future each; a background worker waits a
+    short flush interval so concurrent index_documents calls can pile
+    on, then drains up to MAX_BATCH texts into a single OpenAI request
+    and scatters the vectors back through the futures. One round-trip
+    instead of one per caller.
+    """
+
+    MAX_BATCH = 256
+    FLUSH_INTERVAL = 0.01  # seconds to wait for more texts to arrive
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, batching with any other in-flight requests"""
+        if not texts:
+            return []
+        queue = self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            queue.put_nowait((text, future))
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # Created lazily so the queue and task bind to the running loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+        return self._queue
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            while len(batch) < self.MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                embeddings = await get_openai_service().create_embeddings(
+                    [text for text, _ in batch]
+                )
+                for (_, future), embedding in zip(batch, embeddings):
+                    if not future.done():
+                        future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+_embedding_batcher = EmbeddingBatcher()
+
 class VectorStore:
+    # Below this many documents the brute-force scan is faster than an
+    # ANN lookup (and exact), so HNSW only kicks in past the threshold
+    ANN_THRESHOLD = 1000
+
+    # Most embedding texts to remember by content hash; sitemap re-runs
+    # repeat names/descriptions heavily, so duplicates skip the API
+    EMB_CACHE_SIZE = 8192
+
+    # Most query embeddings to remember; UIs re-issue the same query on
+    # pagination and retries, which then skip the API round-trip
+    QUERY_CACHE_SIZE = 1024
+
     def __init__(self):
         self.documents: List[Dict[str, Any]] = []
-        self.embeddings: List[List[float]] = []
+        # Column of document types parallel to self.documents, plus an
+        # incrementally maintained count per type; type filtering and
+        # get_stats never have to walk the document dicts
+        self._types: List[str] = []
+        self._type_counts: Counter = Counter()
+        self._emb_cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._query_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        # Embedding rows are L2-normalized, then quantized to int8 with a
+        # per-row scale (row ≈ q[i] * inv_scales[i]). Cosine similarity
+        # becomes an integer dot product, moving 4x fewer bytes per query
+        # than float32. Each index_documents call appends a block; blocks
+        # are merged lazily instead of reallocating the matrix per call.
+        self._q_blocks: List[np.ndarray] = []          # int8, shape (n, D) each
+        self._scale_blocks: List[np.ndarray] = []      # float32, shape (n,) each
+        # HNSW index over the same rows, built lazily on first insert;
+        # O(log N) queries once the store outgrows ANN_THRESHOLD
+        self._hnsw = None
         self.indexed_count = 0
+
+    # Merge appended blocks into one contiguous matrix past this count
+    MAX_BLOCKS = 16
+
+    def _consolidate(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Merge pending blocks and return (int8 matrix, scales)"""
+        if not self._q_blocks:
+            return None, None
+        if len(self._q_blocks) > 1:
+            self._q_blocks = [np.concatenate(self._q_blocks, axis=0)]
+            self._scale_blocks = [np.concatenate(self._scale_blocks)]
+        return self._q_blocks[0], self._scale_blocks[0]
+
+    @staticmethod
+    def _quantize(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Quantize normalized float32 rows to int8 with per-row scales"""
+        inv_scales = (np.abs(rows).max(axis=1) / 127.0 + 1e-12).astype(np.float32)
+        quantized = np.round(rows / inv_scales[:, None]).astype(np.int8)
+        return quantized, inv_scales
+
+    def _hnsw_add(self, rows: np.ndarray):
+        """Add normalized float32 rows to the HNSW index, creating or
+        growing it as needed. No-op when hnswlib isn't installed."""
+        if hnswlib is None:
+            return
+        start = len(self.documents)
+        needed = start + rows.shape[0]
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space='cosine', dim=rows.shape[1])
+            self._hnsw.init_index(max_elements=max(needed, self.ANN_THRESHOLD),
+                                  M=16, ef_construction=200)
+        elif needed > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(max(needed, self._hnsw.get_max_elements() * 2))
+        self._hnsw.add_items(rows, np.arange(start, needed))
         
     async def index_documents(self, documents: List[Dict[str, Any]]) -> int:
         """Index documents with vector embeddings"""
@@ -41,13 +171,45 @@ class VectorStore:
                 
                 texts.append(' | '.join(text_parts))
             
-            # Create embeddings
+            # Create embeddings, reusing cached vectors for texts already
+            # embedded in an earlier run (keyed by content hash)
             if texts:
-                embeddings = await openai_service.create_embeddings(texts)
-                
+                hashes = [hashlib.blake2b(text.encode(), digest_size=16).digest()
+                          for text in texts]
+                embeddings: List[Optional[List[float]]] = []
+                for h in hashes:
+                    cached = self._emb_cache.get(h)
+                    if cached is not None:
+                        self._emb_cache.move_to_end(h)
+                    embeddings.append(cached)
+
+                missing = [i for i, emb in enumerate(embeddings) if emb is None]
+                if missing:
+                    fresh = await _embedding_batcher.embed([texts[i] for i in missing])
+                    for i, emb in zip(missing, fresh):
+                        embeddings[i] = emb
+                        self._emb_cache[hashes[i]] = emb
+                        if len(self._emb_cache) > self.EMB_CACHE_SIZE:
+                            self._emb_cache.popitem(last=False)
+                if len(missing) < len(texts):
+                    logger.info("Embedding cache: %d of %d texts reused",
+                                len(texts) - len(missing), len(texts))
+
+                # Normalize once at index time so searches skip it
+                arr = np.asarray(embeddings, dtype=np.float32)
+                arr /= np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12
+                quantized, inv_scales = self._quantize(arr)
+                self._hnsw_add(arr)
+
                 # Store documents and embeddings
                 self.documents.extend(documents)
-                self.embeddings.extend(embeddings)
+                new_types = [doc.get('@type', 'Unknown') for doc in documents]
+                self._types.extend(new_types)
+                self._type_counts.update(new_types)
+                self._q_blocks.append(quantized)
+                self._scale_blocks.append(inv_scales)
+                if len(self._q_blocks) > self.MAX_BLOCKS:
+                    self._consolidate()
                 self.indexed_count += len(documents)
                 
                 logger.info(f"Successfully indexed {len(documents)} documents. Total: {self.indexed_count}")
@@ -59,32 +221,82 @@ class VectorStore:
             logger.error(f"Indexing error: {str(e)}")
             raise Exception(f"Document indexing failed: {str(e)}")
     
-    async def search(self, query: str, limit: int = 10, min_similarity: float = 0.7) -> List[Tuple[Dict[str, Any], float]]:
-        """Search documents using vector similarity"""
+    async def search(self, query: str, limit: int = 10, min_similarity: float = 0.7,
+                     type_filter: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Search documents using vector similarity.
+
+        If type_filter is given, only documents of that Schema.org type are
+        returned; filtering happens before the limit is applied so callers
+        get up to `limit` matching documents.
+        """
         try:
             if not self.documents:
                 logger.warning("No documents indexed for search")
                 return []
-            
-            # Create query embedding
-            query_embeddings = await openai_service.create_embeddings([query])
-            query_embedding = query_embeddings[0]
-            
-            # Calculate similarities
-            similarities = cosine_similarity(
-                [query_embedding], 
-                self.embeddings
-            )[0]
-            
-            # Get top results above threshold
-            results = []
-            for i, similarity in enumerate(similarities):
-                if similarity >= min_similarity:
-                    results.append((self.documents[i], float(similarity)))
-            
-            # Sort by similarity and limit results
-            results.sort(key=lambda x: x[1], reverse=True)
-            results = results[:limit]
+
+            # Create query embedding, reusing the cached (normalized)
+            # vector for recently seen queries. Keyed on the model too so
+            # a config change doesn't serve stale vectors.
+            cache_key = (config.nlweb.embedding_model, query.strip().lower())
+            q = self._query_cache.get(cache_key)
+            if q is not None:
+                self._query_cache.move_to_end(cache_key)
+            else:
+                query_embeddings = await get_openai_service().create_embeddings([query])
+                q = np.asarray(query_embeddings[0], dtype=np.float32)
+                q /= np.linalg.norm(q) + 1e-12
+                self._query_cache[cache_key] = q
+                if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+            # Large stores go through the HNSW index: O(log N) per query
+            # instead of a full scan. Type-filtered searches stay on the
+            # brute-force path, which filters before applying the limit.
+            if (self._hnsw is not None and not type_filter
+                    and len(self.documents) >= self.ANN_THRESHOLD):
+                k = min(limit, self._hnsw.get_current_count())
+                self._hnsw.set_ef(max(50, 2 * k))
+                labels, distances = self._hnsw.knn_query(q[None, :], k=k)
+                results = []
+                for label, dist in zip(labels[0], distances[0]):
+                    similarity = 1.0 - float(dist)
+                    if similarity < min_similarity:
+                        break  # distances come back sorted ascending
+                    results.append((self.documents[int(label)], similarity))
+                logger.info(f"Search for '{query}': {len(results)} results found (ANN)")
+                return results
+
+            # Quantize the query the same way and take the integer dot
+            # product; int32 accumulation avoids overflow at 1536 dims
+            q_mat, inv_scales = self._consolidate()
+            q_quantized, q_inv_scale = self._quantize(q[None, :])
+            int_sims = q_mat.astype(np.int32) @ q_quantized[0].astype(np.int32)
+            similarities = int_sims.astype(np.float32) * (inv_scales * float(q_inv_scale[0]))
+
+            wanted_type = type_filter.lower() if type_filter else None
+            if wanted_type:
+                candidates = np.fromiter(
+                    (i for i, doc_type in enumerate(self._types)
+                     if doc_type.lower() == wanted_type),
+                    dtype=np.int64
+                )
+            else:
+                candidates = np.arange(similarities.shape[0])
+
+            # Threshold and top-k entirely in NumPy; Python tuples are
+            # only built for the final <= limit rows
+            cand_sims = similarities[candidates]
+            mask = cand_sims >= min_similarity
+            if limit < int(mask.sum()):
+                # argpartition (O(N)) instead of a full sort
+                top = np.argpartition(cand_sims, -limit)[-limit:]
+                top = top[cand_sims[top] >= min_similarity]
+            else:
+                top = np.nonzero(mask)[0]
+            top = top[np.argsort(-cand_sims[top])]
+
+            results = [(self.documents[int(candidates[j])], float(cand_sims[j]))
+                       for j in top]
             
             logger.info(f"Search for '{query}': {len(results)} results found")
             return results
@@ -95,24 +307,26 @@ class VectorStore:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get vector store statistics"""
-        type_counts = {}
-        for doc in self.documents:
-            doc_type = doc.get('@type', 'Unknown')
-            type_counts[doc_type] = type_counts.get(doc_type, 0) + 1
-        
         return {
             'total_documents': len(self.documents),
-            'total_embeddings': len(self.embeddings),
+            'total_embeddings': sum(block.shape[0] for block in self._q_blocks),
             'indexed_count': self.indexed_count,
-            'document_types': type_counts,
-            'embedding_dimension': len(self.embeddings[0]) if self.embeddings else 0
+            'document_types': dict(self._type_counts),
+            'embedding_dimension': self._q_blocks[0].shape[1] if self._q_blocks else 0
         }
-    
+
     def clear(self):
         """Clear all indexed documents"""
         self.documents.clear()
-        self.embeddings.clear()
+        self._types.clear()
+        self._type_counts.clear()
+        self._q_blocks.clear()
+        self._scale_blocks.clear()
+        self._hnsw = None
         self.indexed_count = 0
         logger.info("Vector store cleared")
 
-vector_store = VectorStore()
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """Shared in-memory VectorStore, created on first use"""
+    return VectorStore()